@@ -1270,8 +1270,11 @@ def close_page(page, target, **kwargs):
     if not page._full:
         page.body.close()
         page.html.close()
-    with open(target, 'w') as f:
+    # write to a temporary file first, so partial pages are never visible
+    tmp = '{}.tmp'.format(target)
+    with open(tmp, 'w') as f:
         f.write(page())
+    os.replace(tmp, target)
     return page()
 
 
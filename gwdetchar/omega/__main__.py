@@ -24,17 +24,30 @@ configuration file that lists processing options and channels in contextual
 blocks. For more information, see gwdetchar.omega.config.
 """
 
+import h5py
+import multiprocessing
 import numpy
 import os
 import sys
+import time
 import warnings
 
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
 from gwpy.table import Table
 from gwpy.time import to_gps
+from gwpy.timeseries import TimeSeries
 
 from .. import (cli, omega)
 from ..io.datafind import (check_flag, get_data)
 from . import (config, html)
+from ._scan import scan_channel
 
 from matplotlib import use
 use('Agg')
@@ -51,6 +64,9 @@ PROG = ('python -m gwdetchar.omega' if sys.argv[0].endswith('.py')
         else os.path.basename(sys.argv[0]))
 LOGGER = cli.logger(name=PROG.split('python -m ').pop())
 
+# minimum time (seconds) between updates of the in-progress HTML page
+HTML_UPDATE_INTERVAL = 2.
+
 
 # -- utilities ----------------------------------------------------------------
 
@@ -66,6 +82,14 @@ def _finalize_html(analyzed, ifo, gps, htmlv):
     html.write_null_page(ifo, gps, reason, context=ifo.lower())
 
 
+def _update_html(analyzed, ifo, gps, htmlv):
+    """Write the in-progress HTML data product, returning the time written
+    """
+    htmlv['toc'] = analyzed
+    html.write_qscan_page(ifo, gps, analyzed, **htmlv)
+    return time.monotonic()
+
+
 def _init_analyzed_channels():
     """Initialize a running, ordered record of analyzed channels
     """
@@ -77,18 +101,27 @@ def _init_analyzed_channels():
 
 def _load_channel_record(summary, use_checkpoint=True, correlate=True):
     """Load a previous Omega scan from its last saved checkpoint
+
+    Completed channels are returned as a `dict` mapping each channel name
+    to its row index in the record. If the HDF5 `summary` does not exist,
+    a CSV record of the same name (from older analyses) is used instead.
     """
+    if use_checkpoint and not os.path.exists(summary):
+        summary = '{}.csv'.format(os.path.splitext(summary)[0])
     if not (use_checkpoint and os.path.exists(summary)):
-        return ([], [])
+        return ([], {})
     LOGGER.debug('Checkpointing from {}'.format(
         os.path.abspath(summary)))
-    record = Table.read(summary)
+    if summary.endswith('.csv'):
+        record = Table.read(summary, format='csv')
+    else:
+        record = Table.read(summary, path='qscan', format='hdf5')
     if correlate and ('Standard Deviation' not in record.colnames):
         raise KeyError(
             'Cross-correlation is not available from this record, '
             'consider running without correlation or starting from '
             'scratch with --disable-checkpoint')
-    completed = list(record['Channel'])
+    completed = {name: i for (i, name) in enumerate(record['Channel'])}
     return (record, completed)
 
 
@@ -98,12 +131,35 @@ def _load_channel_from_checkpoint(block_name, channel, analyzed,
     """
     LOGGER.info(' -- Checkpointing {} from a previous '
                 'run'.format(channel.name))
-    cindex = completed.index(channel.name)
+    cindex = completed[channel.name]
     channel.load_loudest_tile_features(
         record[cindex], correlated=correlated)
     return html.update_toc(analyzed, channel, name=block_name)
 
 
+def _load_primary(cache, meta):
+    """Load a matched-filter for the primary channel from a previous analysis
+
+    Returns `None` if no cache exists or if its settings differ from `meta`
+    """
+    if not os.path.exists(cache):
+        return None
+    with h5py.File(cache, 'r') as h5f:
+        if any(h5f.attrs.get(key) != value for (key, value) in meta.items()):
+            return None
+        LOGGER.debug('Checkpointing primary channel from {}'.format(
+            os.path.abspath(cache)))
+        return TimeSeries.read(h5f, path='primary', format='hdf5')
+
+
+def _write_primary(cache, correlate, meta):
+    """Save a matched-filter for the primary channel for future analyses
+    """
+    with h5py.File(cache, 'w') as h5f:
+        correlate.write(h5f, path='primary', format='hdf5')
+        h5f.attrs.update(meta)
+
+
 def _parse_configuration(inifiles, ifo=None, gps=None):
     """Parse configuration files for this Omega scan
     """
@@ -119,41 +175,72 @@ def _parse_configuration(inifiles, ifo=None, gps=None):
     return inifiles
 
 
-def _scan_channel(channel, data, analyzed, gps, block, fthresh,
-                  logf, fscale, colormap, block_name, correlate=None):
-    """Perform Omega scan on an individual data channel
+def _read_block(block, gps, nproc=1):
+    """Read `duration` seconds of data for a block of channels, as float64
+    """
+    start = gps - block.duration/2. - 1
+    end = gps + block.duration/2. + 1
+    data = get_data(
+        block.channel_names, start, end,
+        frametype=block.frametype, source=block.source, nproc=nproc,
+        verbose='Reading block:'.rjust(30))
+    # upcast once, this is a no-op for channels stored as float64
+    for (key, series) in data.items():
+        data[key] = series.astype('float64', copy=False)
+    return data
+
+
+def _prefetch_block(reader, toread, gps, nproc=1):
+    """Submit a background read of the next block in `toread`, if any
+    """
+    if not toread:
+        return {}
+    block = toread.popleft()
+    return {block.key: reader.submit(_read_block, block, gps, nproc=nproc)}
+
+
+def _submit_scans(executor, block, data, completed, gps, **kwargs):
+    """Submit Omega scans for a block of channels to a process pool
+
+    Returns a `dict` of futures keyed by channel name, skipping channels
+    that are checkpointed or were not found by `get_data`
     """
-    try:  # scan the channel
-        LOGGER.info(' -- Scanning channel {}'.format(channel.name))
-        series = omega.scan(
-            gps, channel, data.astype('float64'), block.fftlength,
-            resample=block.resample, fthresh=fthresh, search=block.search,
-            logf=logf)
-    except (ValueError, KeyError) as exc:
+    futures = {}
+    for channel in block.channels:
+        if (channel.name in completed) or (channel.name not in data):
+            continue
+        futures[channel.name] = executor.submit(
+            scan_channel, channel, data[channel.name], gps,
+            block.fftlength, resample=block.resample, search=block.search,
+            dt=block.dt, **kwargs)
+    return futures
+
+
+def _wait_for_workers(futures, nproc):
+    """Wait until fewer than `nproc` of a block's Omega scans are pending
+    """
+    pending = set(futures.values())
+    while len(pending) >= nproc:
+        pending = wait(pending, return_when=FIRST_COMPLETED).not_done
+
+
+def _collect_channel(future, channel, analyzed, fthresh, block_name):
+    """Collect the outcome of an Omega scan from its worker process
+    """
+    LOGGER.info(' -- Scanning channel {}'.format(channel.name))
+    scanned = future.result()
+    if isinstance(scanned, Exception):
         warnings.warn("Skipping {}: [{}] {}".format(
-            channel.name, type(exc), str(exc)), UserWarning)
+            channel.name, type(scanned), str(scanned)), UserWarning)
         return analyzed
     # if channel is insignificant, skip it
-    if series is None:
+    if scanned is None:
         LOGGER.warning(
             ' -- Channel not significant at white noise false alarm '
             'rate {} Hz'.format(fthresh))
         return analyzed
-    # plot Omega scan products
-    LOGGER.info(
-        ' -- Plotting Omega scan products for {}'.format(channel.name))
-    plot.write_qscan_plots(gps, channel, series, fscale=fscale,
-                           colormap=colormap)
-    # handle cross-correlation
-    if correlate is not None:
-        LOGGER.info(' -- Cross-correlating {}'.format(channel.name))
-        correlation = omega.cross_correlate(series[2], correlate)
-        channel.save_loudest_tile_features(
-            series[3], correlation, gps=gps, dt=block.dt)
-    else:
-        channel.save_loudest_tile_features(series[3])
     # update the record of analyzed channels
-    return html.update_toc(analyzed, channel, block_name)
+    return html.update_toc(analyzed, scanned, block_name)
 
 
 # -- parse command-line -------------------------------------------------------
@@ -240,6 +327,8 @@ def create_parser():
     )
     cli.add_nproc_option(
         parser,
+        help='the number of processes to use when reading data '
+             'and scanning channels, default: %(default)s',
     )
 
     # return the argument parser
@@ -300,18 +389,13 @@ def main(args=None):
         os.path.expanduser(
             '~/public_html/wdq/{ifo}_{gps}'.format(ifo=ifo, gps=gps),
         ))
-    if not os.path.isdir(outdir):
-        os.makedirs(outdir)
+    for d in ['plots', 'about', 'data']:
+        os.makedirs(os.path.join(outdir, d), exist_ok=True)
     os.chdir(outdir)
     LOGGER.debug('Output directory created as {}'.format(outdir))
 
-    # make subdirectories
-    for d in ['plots', 'about', 'data']:
-        if not os.path.isdir(d):
-            os.makedirs(d)
-
     # load checkpoints, if requested
-    summary = os.path.join('data', 'summary.csv')
+    summary = os.path.join('data', 'summary.h5')
     (record, completed) = _load_channel_record(
         summary,
         use_checkpoint=(not args.disable_checkpoint),
@@ -322,80 +406,151 @@ def main(args=None):
     LOGGER.debug('Setting up HTML at {}'.format(
         os.path.join(outdir, 'index.html')))
     html.write_qscan_page(ifo, gps, analyzed, **htmlv)
+    last_update = time.monotonic()
+    stale = False
 
     # -- compute Q-scan ---------------
 
     # launch Omega scans
     LOGGER.info('Launching Omega scans')
 
-    # construct a matched-filter from primary channel
-    if not args.disable_correlation:
-        LOGGER.debug('Processing primary channel')
-        duration = primary.duration
-        fftlength = primary.fftlength
-        # process `duration` seconds of data centered on gps
-        name = primary.channel.name
-        start = gps - duration/2. - 1
-        end = gps + duration/2. + 1
-        correlate = get_data(
-            name, start, end, frametype=primary.frametype,
-            source=primary.source, nproc=args.nproc,
-            verbose='Reading primary:'.rjust(30))
-        correlate = omega.primary(
-            gps, primary.length, correlate, fftlength,
-            resample=primary.resample, f_low=primary.flow)
-        plot.timeseries_plot(correlate, gps, primary.length, name,
-                             'plots/primary.png', ylabel='Whitened Amplitude')
-        # prepare HTML output
-        htmlv['correlated'] = True
-        htmlv['primary'] = name
-    else:
-        correlate = None
-
-    # range over channel blocks
+    # check that analysis flags are active for all of `duration`
+    active = []
     for block in blocks.values():
-        LOGGER.debug('Processing block {}'.format(block.key))
-        chans = [c.name for c in block.channels]
-        # get configuration
-        duration = block.duration
-        fftlength = block.fftlength
-        # check that analysis flag is active for all of `duration`
         if block.flag and (not args.ignore_state_flags):
             LOGGER.info(' -- Querying state flag {}'.format(block.flag))
-            if not check_flag(block.flag, gps, duration, pad=1):
+            if not check_flag(block.flag, gps, block.duration, pad=1):
                 LOGGER.info(
                     ' -- {} not active, skipping block'.format(block.flag))
                 continue
-        # read `duration` seconds of data
-        if not (set(chans) <= set(completed)):
-            start = gps - duration/2. - 1
-            end = gps + duration/2. + 1
-            data = get_data(
-                chans, start, end, frametype=block.frametype,
-                source=block.source, nproc=args.nproc,
-                verbose='Reading block:'.rjust(30))
-
-        # process individual channels
-        for channel in block.channels:
-            if channel.name in completed:  # load checkpoint
-                analyzed = _load_channel_from_checkpoint(
-                    blocks[channel.section].name, channel, analyzed,
-                    completed, record, (correlate is not None))
-                htmlv['toc'] = analyzed
-                html.write_qscan_page(ifo, gps, analyzed, **htmlv)
-                continue
+        active.append(block)
 
-            if channel.name not in data:
-                # Channel must not have been found by get_data()
-                continue
-
-            analyzed = _scan_channel(
-                channel, data[channel.name], analyzed, gps, block,
-                args.far_threshold, (args.frequency_scaling == 'log'),
-                args.frequency_scaling, args.colormap,
-                blocks[channel.section].name, correlate)
-            htmlv['toc'] = analyzed
-            html.write_qscan_page(ifo, gps, analyzed, **htmlv)
+    # construct a matched-filter from primary channel, reusing the one
+    # saved by a previous analysis if its settings have not changed
+    if not args.disable_correlation:
+        LOGGER.debug('Processing primary channel')
+        name = primary.channel.name
+        cache = os.path.join('data', 'primary.hdf5')
+        meta = {
+            'channel': name,
+            'gps': gps,
+            'duration': primary.duration,
+            'fftlength': primary.fftlength,
+            'length': primary.length,
+            'resample': primary.resample,
+            'flow': primary.flow,
+            # HDF5 attributes cannot be None
+            'frametype': str(primary.frametype),
+            'source': str(primary.source),
+        }
+        correlate = (None if args.disable_checkpoint else
+                     _load_primary(cache, meta))
+        cached = correlate is not None
+
+    # read data in the background, one block ahead of the Omega scans,
+    # skipping blocks whose channels are all checkpointed; all data are
+    # read on this one thread, as `get_data` may fork its own processes
+    with ThreadPoolExecutor(max_workers=1) as reader:
+        if not (args.disable_correlation or cached):
+            # process `duration` seconds of data centered on gps
+            start = gps - primary.duration/2. - 1
+            end = gps + primary.duration/2. + 1
+            pread = reader.submit(
+                get_data, name, start, end, frametype=primary.frametype,
+                source=primary.source, nproc=args.nproc,
+                verbose='Reading primary:'.rjust(30))
+        toread = deque(block for block in active if not all(
+            name in completed for name in block.channel_names))
+        reads = _prefetch_block(reader, toread, gps, nproc=args.nproc)
+
+        # whiten the primary channel while the first block is read
+        if not args.disable_correlation:
+            if not cached:
+                correlate = omega.primary(
+                    gps, primary.length, pread.result(), primary.fftlength,
+                    resample=primary.resample, f_low=primary.flow)
+                _write_primary(cache, correlate, meta)
+            if not (cached and os.path.exists('plots/primary.png')):
+                plot.timeseries_plot(
+                    correlate, gps, primary.length, name, 'plots/primary.png',
+                    ylabel='Whitened Amplitude')
+            # prepare HTML output
+            htmlv['correlated'] = True
+            htmlv['primary'] = name
+        else:
+            correlate = None
+
+        # range over channel blocks, scanning channels in parallel; the next
+        # block is read while this one is scanned, and submitted once this
+        # one has fewer scans pending than workers, so that workers move
+        # straight on to it, and at most two blocks of data (and the last
+        # few channels of an earlier one) are held at once
+        fthresh = args.far_threshold
+        scankw = {
+            'fthresh': fthresh,
+            'logf': (args.frequency_scaling == 'log'),
+            'fscale': args.frequency_scaling,
+            'colormap': args.colormap,
+            'correlate': correlate,
+        }
+        queued = deque()
+        # worker processes are started by a fork server, so that none is
+        # forked while the reader thread is alive
+        executor = ProcessPoolExecutor(
+            max_workers=args.nproc,
+            mp_context=multiprocessing.get_context('forkserver'))
+        with executor:
+            for (n, block) in enumerate(active, start=1):
+                LOGGER.debug('Processing block {}'.format(block.key))
+                data = {}
+                if block.key in reads:
+                    data = reads.pop(block.key).result()
+                queued.append((block, _submit_scans(
+                    executor, block, data, completed, gps, **scankw)))
+                # pending scans now hold the only references to this block's
+                # data, so each channel is released as its scan completes
+                del data
+
+                # process individual channels in order, keeping the latest
+                # block queued until the next one has been submitted
+                nqueue = 1 if n < len(active) else 0
+                while len(queued) > nqueue:
+                    (scanned, futures) = queued.popleft()
+                    for channel in scanned.channels:
+                        nsections = len(analyzed)
+                        if channel.name in completed:  # load checkpoint
+                            analyzed = _load_channel_from_checkpoint(
+                                blocks[channel.section].name, channel,
+                                analyzed, completed, record,
+                                (correlate is not None))
+                        elif channel.name in futures:
+                            analyzed = _collect_channel(
+                                futures.pop(channel.name), channel, analyzed,
+                                fthresh, blocks[channel.section].name)
+                        else:
+                            continue
+                        # only re-render the page if a new section has
+                        # appeared, or if it has not been updated in a while
+                        stale = True
+                        if ((len(analyzed) > nsections) or (
+                                time.monotonic() - last_update >
+                                HTML_UPDATE_INTERVAL)):
+                            last_update = _update_html(
+                                analyzed, ifo, gps, htmlv)
+                            stale = False
+
+                    # flush any pending updates once per block
+                    if stale:
+                        last_update = _update_html(analyzed, ifo, gps, htmlv)
+                        stale = False
+
+                # read the next block only once earlier blocks are collected,
+                # then wait for workers to start coming free
+                if nqueue:
+                    if not reads:
+                        reads.update(_prefetch_block(
+                            reader, toread, gps, nproc=args.nproc))
+                    _wait_for_workers(queued[-1][1], args.nproc)
 
     # -- finalize HTML ----------------
 
@@ -0,0 +1,75 @@
+# coding=utf-8
+# Copyright (C) LIGO Scientific Collaboration (2015-)
+#
+# This file is part of the GW DetChar python package.
+#
+# GW DetChar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# GW DetChar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with GW DetChar.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Worker for scanning Omega scan channels in parallel
+
+This lives apart from `gwdetchar.omega.__main__` so that worker processes
+can import it however the command-line tool is launched
+"""
+
+from .. import (cli, omega)
+
+from matplotlib import use
+use('Agg')
+
+# backend-dependent import
+from . import plot  # noqa: E402
+
+__author__ = 'Alex Urban <alexander.urban@ligo.org>'
+
+# set up logger
+LOGGER = cli.logger(name='gwdetchar.omega')
+
+
+# -- utilities ----------------------------------------------------------------
+
+def scan_channel(channel, data, gps, fftlength, fthresh, logf, fscale,
+                 colormap, resample=0, search=0.5, dt=0.1, correlate=None):
+    """Perform Omega scan on an individual data channel
+
+    This is run in a worker process, and returns the scanned `channel`
+    with its loudest tile features saved, `None` if it is insignificant,
+    or the exception raised if it could not be scanned
+    """
+    try:  # scan the channel
+        series = omega.scan(
+            gps, channel, data, fftlength, resample=resample,
+            fthresh=fthresh, search=search, logf=logf)
+    except (ValueError, KeyError) as exc:
+        return exc
+    # if channel is insignificant, skip it
+    if series is None:
+        return None
+    # plot Omega scan products
+    LOGGER.info(
+        ' -- Plotting Omega scan products for {}'.format(channel.name))
+    plot.write_qscan_plots(gps, channel, series, fscale=fscale,
+                           colormap=colormap)
+    # release everything but the whitened data and Q-gram,
+    # interpolated spectrograms in particular can be very large
+    (wxoft, qgram) = series[2:4]
+    del series
+    # handle cross-correlation
+    if correlate is not None:
+        LOGGER.info(' -- Cross-correlating {}'.format(channel.name))
+        correlation = omega.cross_correlate(wxoft, correlate)
+        channel.save_loudest_tile_features(
+            qgram, correlation, gps=gps, dt=dt)
+    else:
+        channel.save_loudest_tile_features(qgram)
+    return channel
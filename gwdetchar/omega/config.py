@@ -409,4 +409,5 @@ class OmegaChannelList(object):
             self.dt = float(params.get('dt', 0.1))
             chans = params.get('channels', None).strip().split('\n')
             self.channels = [OmegaChannel(c, section, **params) for c in chans]
+            self.channel_names = tuple(c.name for c in self.channels)
         self.params = params.copy()
@@ -114,8 +114,7 @@ def wrap_html(func):
                 initargs[key] = kwargs.pop(key)
         # find outdir
         outdir = kwargs.pop('outdir', initargs['base'])
-        if not os.path.isdir(outdir):
-            os.makedirs(outdir)
+        os.makedirs(outdir, exist_ok=True)
         # determine table of contents and refresh options
         toc = kwargs.pop('toc', {})
         refresh = kwargs.pop('refresh', False)
@@ -243,6 +242,8 @@ def write_summary_table(blocks, correlated, base=os.path.curdir):
     data.write(fname + '.txt', format='ascii', overwrite=True)
     data.write(fname + '.csv', format='csv', overwrite=True)
     data.write(fname + '.tex', format='latex', overwrite=True)
+    # binary record used for checkpointing
+    data.write(fname + '.h5', path='qscan', format='hdf5', overwrite=True)
 
 
 # -- Qscan HTML ---------------------------------------------------------------
@@ -159,6 +159,7 @@ def test_omega_channel_list():
     assert GW.dt == 0.1
     assert GW.channels == [config.OmegaChannel(
         'X1:TEST-STRAIN', GW.key, **GW.params)]
+    assert GW.channel_names == ('X1:TEST-STRAIN',)
 
 
 def test_omega_channel():
@@ -236,6 +236,8 @@ def test_write_summary_table(tmpdir):
     wdir = str(tmpdir)
     os.chdir(wdir)
     html.write_summary_table(ANALYZED, correlated=True)
+    for ext in ('txt', 'csv', 'tex', 'h5'):
+        assert os.path.isfile(os.path.join('data', 'summary.' + ext))
     shutil.rmtree(wdir)
 
 
@@ -19,10 +19,13 @@
 """Tests for the `gwdetchar.omega` command-line interface
 """
 
+import h5py
 import os
 import numpy
 import pytest
 import shutil
+import subprocess
+import sys
 
 from scipy.signal import gausspulse
 from unittest import mock
@@ -215,18 +218,50 @@ def test_main_single_ifo(caplog, tmpdir):
     assert caplog.text.count('Channel not significant') == 1
     assert os.path.isfile(os.path.join(outdir, 'index.html'))
     assert os.path.isfile(os.path.join(outdir, 'data', 'summary.csv'))
+    assert os.path.isfile(os.path.join(outdir, 'data', 'summary.h5'))
+    assert os.path.isfile(os.path.join(outdir, 'data', 'primary.hdf5'))
     assert 'array must not contain infs or NaNs' in record[-1].message.args[0]
     # test with checkpointing
     caplog.clear()
     with pytest.warns(UserWarning) as record:
         omega_cli.main(args)
     assert caplog.text.count('Checkpointing from {}'.format(outdir)) == 1
+    assert caplog.text.count('Checkpointing primary channel from') == 1
     assert caplog.text.count('Checkpointing K1:GW-PRIMARY_CHANNEL '
                              'from a previous run') == 1
     assert caplog.text.count('Checkpointing K1:AUX-HIGH_SIGNIFICANCE '
                              'from a previous run') == 1
     assert caplog.text.count('Channel not significant') == 1
     assert 'array must not contain infs or NaNs' in record[-1].message.args[0]
+    # test that a primary cached with other settings is recomputed
+    cache = os.path.join(outdir, 'data', 'primary.hdf5')
+    with h5py.File(cache, 'a') as h5f:
+        h5f.attrs['source'] = 'other.h5'
+    caplog.clear()
+    with pytest.warns(UserWarning):
+        omega_cli.main(args)
+    assert 'Checkpointing primary channel from' not in caplog.text
+    with h5py.File(cache, 'r') as h5f:
+        assert h5f.attrs['source'] == os.path.join(outdir, 'data.h5')
+    # clean up
+    shutil.rmtree(outdir, ignore_errors=True)
+
+
+def test_main_module_nproc(tmpdir):
+    outdir = str(tmpdir)
+    ini_source = _get_inputs(outdir, K1_CONFIG, K1_DATA)
+    # scan workers must be importable when run with `python -m`
+    subprocess.check_call([
+        sys.executable, '-m', 'gwdetchar.omega',
+        str(GPS),
+        '--ifo', 'K1',
+        '--config-file', ini_source,
+        '--output-dir', outdir,
+        '--ignore-state-flags',
+        '--nproc', '2',
+    ])
+    assert os.path.isfile(os.path.join(outdir, 'index.html'))
+    assert os.path.isfile(os.path.join(outdir, 'data', 'summary.h5'))
     # clean up
     shutil.rmtree(outdir, ignore_errors=True)
 
@@ -314,8 +349,9 @@ def test_main_multiple_config_files(tmpdir):
         '--output-dir', outdir,
         '--ignore-state-flags',
     ]
-    # test output
+    # test output, checkpointing from a CSV record
     omega_cli.main(args)
     assert os.path.exists(os.path.join(outdir, 'index.html'))
+    assert os.path.exists(os.path.join(outdir, 'data', 'summary.h5'))
     # clean up
     shutil.rmtree(outdir, ignore_errors=True)
@@ -30,6 +30,7 @@ from .core import (
     TRANSMON_CHANNELS,
     FREQUENCY_MULTIPLIERS,
     get_fringe_frequency,
+    get_fringe_frequencies,
     get_blrms,
     get_segments,
 )
@@ -59,7 +59,7 @@ from . import (
     HIST_CAPTION,
     SCATTER_CAPTION,
     get_blrms,
-    get_fringe_frequency,
+    get_fringe_frequencies,
     get_segments,
 )
 
@@ -513,9 +513,9 @@ def main(args=None):
             line = axes['position'].plot(ts, color=linecolor)[0]
             linecolor = line.get_color()
             # get fringe frequency and plot
-            fringef = get_fringe_frequency(ts, multiplier=1)
+            fringefs = get_fringe_frequencies(ts)
             for k, m in list(enumerate(FREQUENCY_MULTIPLIERS))[::-1]:
-                fm = fringef * m
+                fm = fringefs[m]
                 line = axes['fringef'].plot(
                     fm, color=fringecolors[k],
                     label=(j == 0 and r'$f\times%d$' % m or None))[0]
@@ -525,7 +525,7 @@ def main(args=None):
                 histdata[m][-fm.size:] = fm.value
             # get segments and plot
             scatter = get_segments(
-                fringef * multiplier,
+                fringefs[multiplier],
                 fthresh,
                 name=flag,
                 pad=args.segment_padding
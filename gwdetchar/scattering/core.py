@@ -21,7 +21,8 @@
 
 import numpy
 
-from scipy.signal import savgol_filter
+from scipy.fft import next_fast_len
+from scipy.signal import (savgol_coeffs, savgol_filter)
 
 __author__ = 'Duncan Macleod <duncan.macleod@ligo.org>'
 __credits__ = ('Siddharth Soni <siddharth.soni@ligo.org>, '
@@ -82,7 +83,13 @@ OPTIC_MOTION_CHANNELS = {
 TRANSMON_CHANNELS = ['ASC-X_TR_B_NSUM_OUT_DQ',
                      'ASC-Y_TR_B_NSUM_OUT_DQ']
 
-FREQUENCY_MULTIPLIERS = range(1, 5)
+FREQUENCY_MULTIPLIERS = numpy.arange(1, 5)
+
+# first-derivative Savitzky-Golay filter (window length 5, polyorder 2):
+# the kernel, in convolution order, and the weights that apply it to the
+# first and last two samples by polynomial fit, as in `savgol_filter`
+_SAVGOL_DERIV = savgol_coeffs(5, 2, deriv=1)
+_SAVGOL_EDGES = savgol_filter(numpy.eye(5), 5, 2, deriv=1, axis=0)
 
 
 def get_fringe_frequency(series, multiplier=2.0):
@@ -105,15 +112,79 @@ def get_fringe_frequency(series, multiplier=2.0):
     --------
     scipy.signal.savgol_filter
         for an implementation of the Savitzky-Golay filter
+
+    Notes
+    -----
+    The derivative is a fixed 5-tap convolution, with the first and last
+    two samples taken from a polynomial fit to the edge windows, which
+    is equivalent to ``savgol_filter(series.value, 5, 2, deriv=1)``.
     """
-    velocity = type(series)(savgol_filter(series.value, 5, 2, deriv=1))
-    velocity.__array_finalize__(series)
-    fringef = numpy.abs(multiplier * 2. / 1.064 * velocity *
-                        velocity.sample_rate.value)
+    data = series.value
+    velocity = numpy.convolve(data, _SAVGOL_DERIV, mode='same')
+    velocity[:2] = _SAVGOL_EDGES[:2] @ data[:5]
+    velocity[-2:] = _SAVGOL_EDGES[-2:] @ data[-5:]
+    # scale to fringe frequency in-place
+    numpy.multiply(velocity, multiplier * 2. / 1.064 *
+                   series.sample_rate.value, out=velocity)
+    numpy.absolute(velocity, out=velocity)
+    fringef = velocity.view(type(series))
+    fringef.__array_finalize__(series)
     fringef.override_unit('Hz')
     return fringef
 
 
+def get_fringe_frequencies(series, multipliers=FREQUENCY_MULTIPLIERS):
+    """Predict scattering fringe frequencies for several harmonics at once
+
+    Parameters
+    ----------
+    series : `~gwpy.timeseries.TimeSeries`
+        timeseries record of relative motion
+
+    multipliers : `list` of `int`, optional
+        harmonic numbers of fringe frequency, default:
+        `FREQUENCY_MULTIPLIERS`
+
+    Returns
+    -------
+    fringefs : `dict` of `~gwpy.timeseries.TimeSeries`
+        timeseries record of fringe frequency for each harmonic, keyed by
+        harmonic number
+
+    See Also
+    --------
+    get_fringe_frequency
+        for the underlying fringe frequency projection
+
+    Notes
+    -----
+    The derivative of `series` is computed only once, and all harmonics
+    are stored in a single `(len(multipliers), series.size)` array
+    """
+    fringef = get_fringe_frequency(series, multiplier=1)
+    values = numpy.multiply.outer(multipliers, fringef.value)
+    fringefs = {}
+    for (m, row) in zip(multipliers, values):
+        fringefs[m] = row.view(type(fringef))
+        fringefs[m].__array_finalize__(fringef)
+    return fringefs
+
+
+def _rms(series, stride=1):
+    """Calculate the root-mean-square value of a `TimeSeries` once per stride
+
+    This is a vectorised equivalent of `TimeSeries.rms`
+    """
+    stridesamp = int(stride * series.sample_rate.value)
+    nsteps = int(series.size // stridesamp)
+    data = series.value[:nsteps * stridesamp].reshape(nsteps, stridesamp)
+    rms = numpy.sqrt(numpy.einsum('ij,ij->i', data, data) / stridesamp)
+    return type(series)(
+        rms, channel=series.channel, t0=series.t0,
+        name='%s %.2f-second RMS' % (series.name, stride),
+        sample_rate=(1/float(stride)))
+
+
 def get_blrms(series, flow=4.0, fhigh=10.0, stride=1, whiten=True,
               fftlength=4, overlap=2, **kwargs):
     """Compute the whitened, band-limited RMS of a `TimeSeries`
@@ -137,7 +208,8 @@ def get_blrms(series, flow=4.0, fhigh=10.0, stride=1, whiten=True,
         whitening of the input, default: `True`
 
     fftlength : `float`, optional
-        FFT integration length (seconds), default: 4
+        FFT integration length (seconds), default: 4, this is rounded
+        up to the nearest length that can be transformed efficiently
 
     overlap : `float`, optional
         FFT overlap length (seconds), default: 2
@@ -155,12 +227,19 @@ def get_blrms(series, flow=4.0, fhigh=10.0, stride=1, whiten=True,
     gwpy.timeseries.TimeSeries.whiten
         for the underlying whitening scheme
     gwpy.timeseries.TimeSeries.rms
-        for the underlying root-mean-square (RMS) estimation method
+        for the root-mean-square (RMS) estimation method, which is
+        vectorised here
     """
+    # whitening applies a tapered FIR filter and the bandpass a zero-phase
+    # IIR filter, neither of which is a spectral mask, so these are not
+    # fused into a single FFT pass that would change the BLRMS trends
     if whiten:
-        series = series.whiten(fftlength=fftlength, overlap=overlap, **kwargs)
+        rate = series.sample_rate.value
+        nfft = next_fast_len(int(round(fftlength * rate)), real=True)
+        series = series.whiten(
+            fftlength=(nfft / rate), overlap=overlap, **kwargs)
     bpseries = series.bandpass(flow, fhigh)
-    return bpseries.rms(stride)
+    return _rms(bpseries, stride)
 
 
 def get_segments(series, threshold, name=None, pad=0):
@@ -184,12 +263,35 @@ def get_segments(series, threshold, name=None, pad=0):
     --------
     threshflag : `~gwpy.segments.DataQualityFlag`
         the populated data-quality flag
+
+    Notes
+    -----
+    Each contiguous run of samples at or above `threshold` is converted
+    to an active segment, running from the first such sample to the next
+    sample below `threshold` (or the end of `series`), equivalent to
+    `~gwpy.timeseries.StateTimeSeries.to_dqflag`
     """
+    from gwpy.segments import (DataQualityFlag, Segment, SegmentList)
     if series.value.max() < threshold:
-        from gwpy.segments import DataQualityFlag
         return DataQualityFlag(name, known=[series.span])
-    else:
-        thresh = series >= threshold * series.unit
-        threshflag = thresh.to_dqflag(name or series.name)
-        threshflag.protract(pad)
-        return threshflag.coalesce()
+    # find the edges of each run of samples above threshold
+    above = numpy.zeros(series.size + 2, dtype=bool)
+    numpy.greater_equal(series.value, threshold, out=above[1:-1])
+    edges = numpy.flatnonzero(above[1:] != above[:-1])
+    times = series.t0.value + edges * series.dt.value
+    # pad within the known span, then merge overlapping segments
+    (start, end) = series.span
+    starts = numpy.clip(times[0::2] - pad, start, end)
+    ends = numpy.clip(times[1::2] + pad, start, end)
+    disjoint = starts[1:] > ends[:-1]
+    active = SegmentList(map(
+        Segment,
+        starts[numpy.concatenate(([True], disjoint))],
+        ends[numpy.concatenate((disjoint, [True]))],
+    ))
+    return DataQualityFlag(
+        name=name or series.name,
+        active=active,
+        known=[series.span],
+        label='{0!s} >= {1!s}'.format(series.name, threshold * series.unit),
+    )
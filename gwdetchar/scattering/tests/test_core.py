@@ -21,6 +21,8 @@
 
 import numpy
 from numpy import testing as nptest
+from scipy.fft import next_fast_len
+from scipy.signal import savgol_filter
 
 from gwpy.timeseries import TimeSeries
 from gwpy.testing.utils import assert_segmentlist_equal
@@ -48,14 +50,44 @@ def test_get_fringe_frequency():
     assert fringef.size == OPTIC.size
     nptest.assert_almost_equal(
         fringef.value.max() * (1.064 / 2) / TWOPI, 10, decimal=2)
+    # should match a direct Savitzky-Golay derivative, including edges
+    velocity = savgol_filter(OPTIC.value, 5, 2, deriv=1)
+    nptest.assert_allclose(
+        fringef.value, numpy.abs(2. / 1.064 * velocity * 2048), atol=1e-10)
+
+
+def test_get_fringe_frequencies():
+    # calculate fringe frequencies for all harmonics
+    fringef = core.get_fringe_frequency(OPTIC, multiplier=1)
+    fringefs = core.get_fringe_frequencies(OPTIC)
+    assert list(fringefs) == list(core.FREQUENCY_MULTIPLIERS)
+    for (m, fm) in fringefs.items():
+        assert str(fm.unit) == 'Hz'
+        assert fm.t0 == OPTIC.t0
+        assert fm.sample_rate == OPTIC.sample_rate
+        nptest.assert_allclose(fm.value, m * fringef.value)
 
 
 def test_get_blrms():
     # calculate the whitened, band-limited RMS
     fringef = core.get_fringe_frequency(OPTIC, multiplier=1)
     wblrms = core.get_blrms(fringef, fhigh=20, whiten=False)
-    nptest.assert_array_equal(  # BLRMS should be equivalent
-        wblrms.value, fringef.bandpass(4, 20).rms(1).value)
+    rms = fringef.bandpass(4, 20).rms(1)
+    nptest.assert_allclose(  # BLRMS should be equivalent
+        wblrms.value, rms.value, rtol=1e-12)
+    assert wblrms.name == rms.name
+    assert wblrms.t0 == rms.t0
+    assert wblrms.sample_rate == rms.sample_rate
+    # test with whitening, using an awkward FFT length
+    wblrms = core.get_blrms(fringef, fhigh=20, fftlength=4.1, overlap=2)
+    assert wblrms.size == OPTIC.duration.value
+    assert numpy.isfinite(wblrms.value).all()
+    # the FFT length should be rounded up to a fast size
+    nfft = next_fast_len(round(4.1 * 2048), real=True)
+    assert nfft > round(4.1 * 2048)
+    rms = fringef.whiten(fftlength=(nfft / 2048), overlap=2).bandpass(
+        4, 20).rms(1)
+    nptest.assert_allclose(wblrms.value, rms.value, rtol=1e-12)
 
 
 def test_get_segments():
@@ -65,3 +97,20 @@ def test_get_segments():
     assert dqflag.name == fringef.name
     assert len(dqflag.active) == 640
     assert_segmentlist_equal(dqflag.known, [OPTIC.span])
+
+
+def test_get_segments_pad():
+    # pad overlapping runs of samples above threshold, including at edges
+    series = TimeSeries(
+        [1., 0, 0, 1, 1, 0, 0, 0, 0, 0, 1, 0, 1, 0, 0, 1],
+        sample_rate=4, unit='Hz', name='X1:TEST')
+    dqflag = core.get_segments(series, 1, pad=0.5)
+    # should match thresholding and padding with gwpy
+    expected = (series >= 1 * series.unit).to_dqflag(series.name)
+    expected.protract(0.5)
+    expected = expected.coalesce()
+    assert len(dqflag.active) == 2
+    assert_segmentlist_equal(dqflag.active, expected.active)
+    assert_segmentlist_equal(dqflag.known, expected.known)
+    assert dqflag.name == expected.name
+    assert dqflag.label == expected.label == 'X1:TEST >= 1.0 Hz'